@@ -0,0 +1,106 @@
+import bz2
+import gzip
+import io
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024**2
+# Magic bytes at the start of the compressed stream
+CODECS = {
+    "gzip": b"\x1f\x8b",
+    # "BZh" followed by the block size (level) digit
+    "bz2": tuple(b"BZh%d" % level for level in range(1, 10)),
+    "zstd": b"\x28\xb5\x2f\xfd",
+    "zip": b"PK\x03\x04",
+}
+EXTENSIONS = {
+    "gzip": ".gz",
+    "bz2": ".bz2",
+    "zstd": ".zst",
+    "zip": ".zip",
+}
+# Fast levels, to keep compression from being the bottleneck
+LEVELS = {
+    "gzip": 1,
+    "bz2": 1,
+    "zstd": 3,
+    "zip": 1,
+}
+# Excel (xlsx) files are zip archives themselves
+OOXML_CONTENT_TYPES = "[Content_Types].xml"
+
+
+def detect_codec(head: bytes) -> str | None:
+    for codec, magic in CODECS.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def open_decompressed(stream: io.BufferedReader) -> io.BufferedIOBase:
+    # Decompressing stream (or the stream itself if it is not compressed)
+    codec = detect_codec(stream.peek(4)[:4])
+    if codec == "gzip":
+        return io.BufferedReader(gzip.GzipFile(fileobj=stream), CHUNK_SIZE)
+    if codec == "bz2":
+        return io.BufferedReader(bz2.BZ2File(stream), CHUNK_SIZE)
+    if codec == "zstd":
+        _require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            stream, read_across_frames=True
+        )
+        return io.BufferedReader(reader, CHUNK_SIZE)
+    if codec == "zip":
+        archive = zipfile.ZipFile(stream)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if OOXML_CONTENT_TYPES in archive.namelist() or not members:
+            stream.seek(0)
+            return stream
+        if len(members) > 1:
+            names = ", ".join(info.filename for info in members)
+            raise ValueError(
+                f"Zip archive contains {len(members)} files ({names}), "
+                "only archives of a single file can be extracted"
+            )
+        return io.BufferedReader(archive.open(members[0]), CHUNK_SIZE)
+    return stream
+
+
+@contextmanager
+def open_compressed(
+    path: str, codec: str | None, member: str = "data"
+) -> Iterator[BinaryIO]:
+    # Binary file to write to, compressed (while writing) with the given codec
+    if codec is None:
+        with open(path, "wb") as f:
+            yield f
+    elif codec == "gzip":
+        with gzip.open(path, "wb", compresslevel=LEVELS[codec]) as f:
+            yield f
+    elif codec == "bz2":
+        with bz2.open(path, "wb", compresslevel=LEVELS[codec]) as f:
+            yield f
+    elif codec == "zstd":
+        _require_zstandard()
+        compressor = zstandard.ZstdCompressor(level=LEVELS[codec], threads=-1)
+        with open(path, "wb") as f, compressor.stream_writer(f) as writer:
+            yield writer
+    elif codec == "zip":
+        with zipfile.ZipFile(
+            path, "w", zipfile.ZIP_DEFLATED, compresslevel=LEVELS[codec]
+        ) as archive:
+            with archive.open(member, "w", force_zip64=True) as f:
+                yield f
+    else:
+        raise ValueError(f"Unsupported compression: {codec}")
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("Zstandard (de)compression requires the zstandard package")
@@ -0,0 +1,238 @@
+import atexit
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterable, Iterator, TextIO
+
+import pandas as pd
+from pandas import DataFrame
+
+from compress import EXTENSIONS as COMPRESSED_EXTENSIONS, LEVELS, open_compressed
+from extract import export_sql
+from sql import write_chunks
+
+CACHE_SIZE = 8
+CHUNK_SIZE = 100_000
+EXTENSIONS = {
+    ",": ".csv",
+    ";": ".csv",
+    "|": ".txt",
+    " ": ".txt",
+    "\t": ".tsv",
+}
+
+# Converted outputs (temp file paths) keyed by dataset fingerprint & load options
+_cache: OrderedDict[tuple, str] = OrderedDict()
+_lock = threading.Lock()
+
+
+def fingerprint(df: DataFrame) -> str:
+    # Hash the contents, column names and data types of the DataFrame
+    digest = hashlib.sha1(str(list(df.columns)).encode())
+    digest.update(str(list(df.dtypes)).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df).values.tobytes())
+    except TypeError:
+        # Unhashable cell values (e.g. lists), fall back on their representation
+        digest.update(pd.util.hash_pandas_object(df.astype(str)).values.tobytes())
+    return digest.hexdigest()
+
+
+def extension(
+    file_type_out: str, delimiter_out: str | None, compression: str | None = None
+) -> str | None:
+    if file_type_out == "Delimited":
+        suffix = EXTENSIONS.get(delimiter_out)
+    elif file_type_out == "Excel":
+        # Excel files are compressed already
+        return ".xlsx"
+    elif file_type_out == "SQL":
+        suffix = ".sql"
+    else:
+        return None
+    if suffix is not None and compression is not None:
+        suffix += COMPRESSED_EXTENSIONS[compression]
+    return suffix
+
+
+def cache_key(
+    fingerprint: str,
+    file_type_out: str,
+    delimiter_out: str | None,
+    db_name: str,
+    db_table: str,
+    compression: str | None = None,
+    member: str = "",
+) -> tuple:
+    # Only the options of the selected file type influence the output
+    if file_type_out != "Delimited":
+        delimiter_out = None
+    if file_type_out != "SQL":
+        db_name, db_table = "", ""
+    if file_type_out == "Excel":
+        compression = None
+    if compression != "zip":
+        # The name of the file within the archive
+        member = ""
+    return (
+        fingerprint,
+        file_type_out,
+        delimiter_out,
+        db_name,
+        db_table,
+        compression,
+        member,
+    )
+
+
+def open_cached(key: tuple) -> BinaryIO | None:
+    # Open an earlier conversion (if still available). Opened within the lock, as
+    # other sessions might evict (remove) it afterwards, while an open file remains
+    # readable
+    with _lock:
+        path = _cache.get(key)
+        if path is None:
+            return None
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return f
+
+
+def convert_df(chunks: Iterable[DataFrame], key: tuple) -> BinaryIO:
+    # Convert the data (in chunks, written as they are read)
+    _, file_type_out, delimiter_out, db_name, db_table, compression, member = key
+    return _convert(
+        key,
+        extension(file_type_out, delimiter_out, compression),
+        lambda path: _write(
+            chunks,
+            path,
+            file_type_out,
+            delimiter_out,
+            db_name,
+            db_table,
+            compression,
+            member,
+        ),
+    )
+
+
+def tables_key(source_id: str, delimiter: str, encoding: str | None = None) -> tuple:
+    return ("tables", source_id, delimiter, encoding)
+
+
+def export_tables(source, key: tuple) -> BinaryIO:
+    # All tables of a SQL script as zipped CSV files (parsing the script once)
+    _, _, delimiter, encoding = key
+    return _convert(
+        key, ".zip", lambda path: _write_tables(source, path, delimiter, encoding)
+    )
+
+
+def _convert(key: tuple, suffix: str | None, write: Callable[[str], None]) -> BinaryIO:
+    f = open_cached(key)
+    if f is not None:
+        return f
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="etl_")
+    os.close(fd)
+    try:
+        write(path)
+    except BaseException:
+        os.remove(path)
+        raise
+    with _lock:
+        _cache[key] = path
+        f = open(path, "rb")
+        # Evict the least recently used conversions
+        while len(_cache) > CACHE_SIZE:
+            _, old_path = _cache.popitem(last=False)
+            _remove(old_path)
+    return f
+
+
+def clear_cache():
+    with _lock:
+        while _cache:
+            _, path = _cache.popitem()
+            _remove(path)
+
+
+def _write(
+    chunks: Iterable[DataFrame],
+    path: str,
+    file_type_out: str,
+    delimiter_out: str | None,
+    db_name: str,
+    db_table: str,
+    compression: str | None,
+    member: str,
+):
+    # - CSV / TXT / TSV (written & compressed in chunks)
+    if file_type_out == "Delimited":
+        with _open_text(path, compression, member) as f:
+            for idx, df in enumerate(chunks):
+                df.to_csv(
+                    f,
+                    index=False,
+                    header=idx == 0,
+                    sep=delimiter_out,
+                    chunksize=CHUNK_SIZE,
+                )
+    # - Excel (the workbook is built in memory)
+    elif file_type_out == "Excel":
+        with pd.ExcelWriter(path) as writer:
+            row = 0
+            for df in chunks:
+                df.to_excel(
+                    writer,
+                    sheet_name="Sheet1",
+                    index=False,
+                    header=row == 0,
+                    startrow=row + 1 if row else 0,
+                )
+                row += df.shape[0]
+    # - SQL
+    elif file_type_out == "SQL":
+        with _open_text(path, compression, member) as f:
+            write_chunks(f, chunks, db_name, db_table)
+    # - JSON
+    # - XML
+    else:
+        raise ValueError(f"Unsupported file type: {file_type_out}")
+
+
+def _write_tables(source, path: str, delimiter: str, encoding: str | None):
+    with tempfile.TemporaryDirectory(prefix="etl_") as directory:
+        paths = export_sql(source, directory, delimiter, encoding)
+        # Each CSV is compressed from disk into the archive
+        with zipfile.ZipFile(
+            path, "w", zipfile.ZIP_DEFLATED, compresslevel=LEVELS["zip"]
+        ) as archive:
+            for table_path in paths.values():
+                archive.write(table_path, os.path.basename(table_path))
+
+
+@contextmanager
+def _open_text(path: str, compression: str | None, member: str) -> Iterator[TextIO]:
+    with open_compressed(path, compression, member or "data") as f:
+        with io.TextIOWrapper(f, encoding="utf-8", newline="") as text:
+            yield text
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+atexit.register(clear_cache)
@@ -0,0 +1,435 @@
+import csv
+import datetime
+import decimal
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from io import StringIO
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from sql import NULL, PostgreSQL
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+BATCH_SIZE = 10_000
+CHUNK_SIZE = 50_000
+POOL_SIZE = 4
+POOL_TIMEOUT = 30
+# Data types the chunks are cast to, nullable so NULL values do not change the type
+# of a chunk (strings as pandas constructs them)
+INTEGER_DTYPE = "Int64"
+FLOAT_DTYPE = "float64"
+STRING_DTYPE = pd.Series(["a"]).dtype
+DTYPES = {
+    bool: "boolean",
+    int: INTEGER_DTYPE,
+    float: FLOAT_DTYPE,
+    decimal.Decimal: FLOAT_DTYPE,
+    str: STRING_DTYPE,
+}
+
+
+class Adapter(ABC):
+    # Inferred (PostgreSQL script) types mapped to the types of the backend
+    types = {}
+    placeholder = "?"
+
+    def __init__(self, url: str):
+        self.url = url
+
+    @abstractmethod
+    def connect(self):
+        pass
+
+    def quote(self, name: str) -> str:
+        return ".".join(_quote(part) for part in name.split("."))
+
+    def cursor(self, conn, chunk_size: int):
+        return conn.cursor()
+
+    def dtypes(self, conn, cursor, table: str) -> dict[str, object]:
+        # Data types of the result columns (if known before reading the values)
+        return {}
+
+    def create_table(self, conn, table: str, columns: dict[str, str]):
+        column_defs = ", ".join(
+            f"{self.quote(column)} {self.types.get(d_type, d_type or 'TEXT')}"
+            for column, d_type in columns.items()
+        )
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {self.quote(table)}")
+        cursor.execute(f"CREATE TABLE {self.quote(table)} ({column_defs})")
+        conn.commit()
+
+    def alter_columns(
+        self, conn, table: str, columns: dict[str, str], changed: dict[str, str]
+    ):
+        # Change the (changed) column types of a table holding data already
+        raise NotImplementedError
+
+    def insert(self, conn, table: str, columns: list[str], rows: list[tuple]):
+        # Insert a batch of rows within a single transaction
+        names = ", ".join(self.quote(column) for column in columns)
+        values = ", ".join(self.placeholder for _ in columns)
+        cursor = conn.cursor()
+        cursor.executemany(
+            f"INSERT INTO {self.quote(table)} ({names}) VALUES ({values})", rows
+        )
+        conn.commit()
+
+
+class SQLiteAdapter(Adapter):
+    types = {
+        "BIT": "TEXT",
+        "NUMERIC": "INTEGER",
+        "FLOAT": "REAL",
+        "TIMESTAMP": "TEXT",
+        "DATE": "TEXT",
+        "VARCHAR(255)": "TEXT",
+        "TEXT": "TEXT",
+    }
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        # sqlite:///relative.db, sqlite:////absolute.db or sqlite:// (in memory)
+        self.path = url.split("://", 1)[1][1:] or ":memory:"
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def quote(self, name: str) -> str:
+        # SQLite has no schemas (other than attached databases)
+        return _quote(name)
+
+    def alter_columns(
+        self, conn, table: str, columns: dict[str, str], changed: dict[str, str]
+    ):
+        # Column types cannot be changed, so the table is rebuilt (values would
+        # otherwise be converted to the type affinity of the column, e.g. 007 to 7)
+        previous = f"{table}_{uuid.uuid4().hex}"
+        conn.execute(
+            f"ALTER TABLE {self.quote(table)} RENAME TO {self.quote(previous)}"
+        )
+        self.create_table(conn, table, columns)
+        conn.execute(
+            f"INSERT INTO {self.quote(table)} SELECT * FROM {self.quote(previous)}"
+        )
+        conn.execute(f"DROP TABLE {self.quote(previous)}")
+        conn.commit()
+
+    def dtypes(self, conn, cursor, table: str) -> dict[str, object]:
+        # Type affinity of the declared column types of a table (query results
+        # are not described)
+        if table == "":
+            return {}
+        dtypes = {}
+        for _, name, declared, *_ in conn.execute(
+            f"PRAGMA table_info({self.quote(table)})"
+        ):
+            declared = declared.upper()
+            if "INT" in declared:
+                dtypes[name] = INTEGER_DTYPE
+            elif any(affinity in declared for affinity in ("CHAR", "CLOB", "TEXT")):
+                dtypes[name] = STRING_DTYPE
+            elif any(affinity in declared for affinity in ("REAL", "FLOA", "DOUB")):
+                dtypes[name] = FLOAT_DTYPE
+        return dtypes
+
+
+class PostgreSQLAdapter(Adapter):
+    types = {
+        "BIT": "TEXT",
+    }
+    placeholder = "%s"
+    # Data types by type OID (the type code of the cursor description)
+    type_codes = {
+        16: "boolean",
+        20: INTEGER_DTYPE,
+        21: INTEGER_DTYPE,
+        23: INTEGER_DTYPE,
+        700: FLOAT_DTYPE,
+        701: FLOAT_DTYPE,
+        1700: FLOAT_DTYPE,
+        25: STRING_DTYPE,
+        1042: STRING_DTYPE,
+        1043: STRING_DTYPE,
+        1114: "datetime64[ns]",
+    }
+
+    def connect(self):
+        if psycopg2 is None:
+            raise ImportError("PostgreSQL loading requires the psycopg2 package")
+        # psycopg2 does not accept a driver in the scheme (postgresql+psycopg2://)
+        scheme, rest = self.url.split("://", 1)
+        return psycopg2.connect(f"{scheme.split('+')[0]}://{rest}")
+
+    def cursor(self, conn, chunk_size: int):
+        # Named (server-side) cursor, rows are only sent when fetched
+        cursor = conn.cursor(name=f"etl_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+        return cursor
+
+    def dtypes(self, conn, cursor, table: str) -> dict[str, object]:
+        return {
+            column.name: self.type_codes[column.type_code]
+            for column in cursor.description
+            if column.type_code in self.type_codes
+        }
+
+    def create_table(self, conn, table: str, columns: dict[str, str]):
+        if "." in table:
+            schema = table.split(".")[0]
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {self.quote(schema)}")
+        super().create_table(conn, table, columns)
+
+    def alter_columns(
+        self, conn, table: str, columns: dict[str, str], changed: dict[str, str]
+    ):
+        cursor = conn.cursor()
+        for column, d_type in changed.items():
+            d_type = self.types.get(d_type, d_type)
+            cursor.execute(
+                f"ALTER TABLE {self.quote(table)} ALTER COLUMN {self.quote(column)} "
+                f"TYPE {d_type} USING {self.quote(column)}::text::{d_type}"
+            )
+        conn.commit()
+
+    def insert(self, conn, table: str, columns: list[str], rows: list[tuple]):
+        # COPY the batch as CSV (empty unquoted values are loaded as NULL)
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        names = ", ".join(self.quote(column) for column in columns)
+        cursor = conn.cursor()
+        cursor.copy_expert(
+            f"COPY {self.quote(table)} ({names}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        conn.commit()
+
+
+ADAPTERS = {
+    "sqlite": SQLiteAdapter,
+    "postgres": PostgreSQLAdapter,
+    "postgresql": PostgreSQLAdapter,
+}
+
+
+class ConnectionPool:
+    def __init__(self, adapter: Adapter, size: int = POOL_SIZE):
+        self.adapter = adapter
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self.adapter.connect()
+            except BaseException:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=POOL_TIMEOUT)
+
+
+# Connection pools are kept across Streamlit reruns (one pool per connection string)
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_adapter(url: str) -> Adapter:
+    scheme = urlparse(url).scheme.split("+")[0].lower()
+    if scheme not in ADAPTERS:
+        raise ValueError(f"Unsupported database: {scheme or url}")
+    return ADAPTERS[scheme](url)
+
+
+def get_pool(url: str) -> ConnectionPool:
+    with _pools_lock:
+        if url not in _pools:
+            adapter = get_adapter(url)
+            # Every in-memory SQLite connection is a separate database
+            size = 1 if getattr(adapter, "path", None) == ":memory:" else POOL_SIZE
+            _pools[url] = ConnectionPool(adapter, size)
+        return _pools[url]
+
+
+def bulk_load(
+    chunks: Iterable[DataFrame],
+    url: str,
+    table: str,
+    batch_size: int = BATCH_SIZE,
+    progress: Callable[[int, int | None, float], None] | None = None,
+    total: int | None = None,
+) -> tuple[int, float]:
+    # Create the table from the inferred types of the first chunk (widening the
+    # columns later chunks require a higher type of) and insert the data in
+    # batches, reporting the rows loaded, total rows (if known) & elapsed seconds
+    # (type inference included) once the table is created and after each batch
+    start = time.perf_counter()
+    pool = get_pool(url)
+    sql = None
+    loaded = 0
+    with pool.connection() as conn:
+        for chunk in chunks:
+            chunk_sql = PostgreSQL(chunk, "", table)
+            columns = chunk_sql.infer_types()
+            if sql is None:
+                sql = chunk_sql
+                pool.adapter.create_table(conn, table, columns)
+                if progress is not None:
+                    progress(loaded, total, time.perf_counter() - start)
+            elif changed := sql.merge_types(columns):
+                types = {column: info["type"] for column, info in sql.columns.items()}
+                pool.adapter.alter_columns(conn, table, types, changed)
+            rows = _iter_rows(chunk)
+            while batch := list(islice(rows, batch_size)):
+                pool.adapter.insert(conn, table, list(columns), batch)
+                loaded += len(batch)
+                if progress is not None:
+                    progress(loaded, total, time.perf_counter() - start)
+    return loaded, time.perf_counter() - start
+
+
+def read_chunks(
+    url: str,
+    table: str = "",
+    query: str = "",
+    chunk_size: int = CHUNK_SIZE,
+    dtype: str | None = None,
+) -> Iterator[DataFrame]:
+    # Fetch the rows of a table (or query) through a cursor in DataFrame chunks
+    pool = get_pool(url)
+    if query == "":
+        query = f"SELECT * FROM {pool.adapter.quote(table)}"
+    with pool.connection() as conn:
+        cursor = pool.adapter.cursor(conn, chunk_size)
+        try:
+            cursor.execute(query)
+            # Server-side cursors only describe the result once fetched from
+            rows = cursor.fetchmany(chunk_size)
+            if cursor.description is None:
+                raise ValueError("Query returns no rows")
+            columns = [column[0] for column in cursor.description]
+            # Every chunk is cast to the data types of the columns, as described
+            # by the database or otherwise of the first values read
+            described = pool.adapter.dtypes(conn, cursor, table)
+            dtypes = [described.get(column) for column in columns]
+            # An empty result still yields a (column only) chunk
+            yield _to_chunk(rows, columns, dtype, dtypes)
+            while rows := cursor.fetchmany(chunk_size):
+                yield _to_chunk(rows, columns, dtype, dtypes)
+        finally:
+            cursor.close()
+            conn.rollback()
+
+
+def read_database(
+    url: str,
+    table: str = "",
+    query: str = "",
+    chunk_size: int = CHUNK_SIZE,
+    dtype: str | None = None,
+) -> DataFrame:
+    chunks = read_chunks(url, table, query, chunk_size, dtype)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _to_chunk(
+    rows: list[tuple], columns: list[str], dtype: str | None, dtypes: list
+) -> DataFrame:
+    df = DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    if dtype == "str":
+        # String interpretation (missing values remain missing)
+        return df.astype(str).where(df.notna())
+    for idx in range(len(columns)):
+        if dtypes[idx] is None:
+            # Data type of the first (non NULL) values of the column
+            types = {type(row[idx]) for row in rows if row[idx] is not None}
+            if not types:
+                continue
+            if types == {int, float}:
+                types = {float}
+            if len(types) > 1:
+                dtypes[idx] = object
+            else:
+                # Other values (e.g. datetimes) keep the type of the first chunk
+                dtypes[idx] = DTYPES.get(types.pop(), df.dtypes.iloc[idx])
+        try:
+            df.isetitem(idx, df.iloc[:, idx].astype(dtypes[idx]))
+        except (TypeError, ValueError):
+            # Values of another type (e.g. by the dynamic typing of SQLite)
+            dtypes[idx] = object
+            df.isetitem(idx, df.iloc[:, idx].astype(object))
+    return df
+
+
+def _iter_rows(df: DataFrame) -> Iterator[tuple]:
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(_to_value(value) for value in row)
+
+
+def _to_value(value):
+    # Missing values (NaN, None, NaT) & empty or NULL strings are loaded as NULL
+    if isinstance(value, str):
+        return None if value == "" or value == NULL else value
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _quote(name: str) -> str:
+    escaped = name.replace('"', '""')
+    return f'"{escaped}"'
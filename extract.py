@@ -0,0 +1,180 @@
+import codecs
+import io
+import mmap
+import os
+from typing import Callable, TypeVar
+
+import pandas as pd
+from pandas import DataFrame
+
+from compress import open_decompressed
+from sql import iter_statements, parse_dump, write_tables
+
+CHUNK_SIZE = 1024**2
+SAMPLE_SIZE = 64 * 1024
+BOMS = [
+    # UTF-32 first, as its LE BOM starts with the UTF-16 LE BOM
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+FALLBACK_ENCODINGS = ["utf-8", "cp1252", "latin-1"]
+
+T = TypeVar("T")
+
+
+class BufferReader(io.RawIOBase):
+    # Read-only file object over a memoryview (reads copy one chunk at a time)
+    def __init__(self, view: memoryview):
+        self.view = view
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        size = min(len(b), len(self.view) - self.pos)
+        if size <= 0:
+            return 0
+        b[:size] = self.view[self.pos : self.pos + size]
+        self.pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            self.pos = len(self.view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self.pos = max(self.pos, 0)
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+
+def open_source(source) -> memoryview:
+    # Uploaded files (BytesIO) are viewed without copying, paths are memory-mapped
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()
+    return memoryview(source)
+
+
+def detect_encodings(sample: bytes) -> list[str]:
+    # Encoding from the byte order mark, otherwise the ones able to decode a
+    # sample of the data (in order of preference)
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return [encoding]
+    encodings = []
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            # Incremental, as the sample might end within a character
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        encodings.append(encoding)
+    return encodings or FALLBACK_ENCODINGS[-1:]
+
+
+def binary_stream(view: memoryview) -> io.BufferedIOBase:
+    # Binary stream, decompressed while reading if the data is compressed
+    return open_decompressed(io.BufferedReader(BufferReader(view), CHUNK_SIZE))
+
+
+def seekable_stream(view: memoryview) -> io.BufferedIOBase:
+    stream = io.BufferedReader(BufferReader(view), CHUNK_SIZE)
+    decompressed = open_decompressed(stream)
+    if decompressed is stream:
+        return stream
+    # Decompressed into memory, as Excel files are read with random access
+    return io.BytesIO(decompressed.read())
+
+
+def text_stream(
+    view: memoryview, encoding: str, newline: str | None = None
+) -> io.TextIOWrapper:
+    # Incrementally decoded text stream
+    return io.TextIOWrapper(binary_stream(view), encoding=encoding, newline=newline)
+
+
+def read_text(
+    view: memoryview,
+    encoding: str | None,
+    read: Callable[[io.TextIOWrapper], T],
+    newline: str | None = None,
+) -> T:
+    # Read the decoded text stream. A detected encoding is based on a sample of
+    # the data only, so the next one is tried if the rest of the data does not
+    # decode (e.g. a cp1252 character after the sampled part)
+    encodings = [encoding]
+    if encoding is None:
+        with binary_stream(view) as stream:
+            encodings = detect_encodings(stream.peek(SAMPLE_SIZE)[:SAMPLE_SIZE])
+    for encoding in encodings[:-1]:
+        try:
+            with text_stream(view, encoding, newline) as stream:
+                return read(stream)
+        except UnicodeDecodeError:
+            continue
+    with text_stream(view, encodings[-1], newline) as stream:
+        return read(stream)
+
+
+def read_delimited(
+    source, sep: str | None, dtype: str | None, encoding: str | None = None
+) -> DataFrame:
+    with open_source(source) as view:
+        return read_text(
+            view,
+            encoding,
+            lambda stream: pd.read_csv(stream, sep=sep, dtype=dtype, engine="python"),
+            newline="",
+        )
+
+
+def sheet_names(source) -> list[str]:
+    with open_source(source) as view:
+        with pd.ExcelFile(seekable_stream(view)) as xl:
+            return xl.sheet_names
+
+
+def read_excel(source, sheet: str | int = 0) -> DataFrame:
+    with open_source(source) as view:
+        return pd.read_excel(seekable_stream(view), sheet)
+
+
+def read_sql(source, encoding: str | None = None) -> dict[str, DataFrame]:
+    # DataFrame per table of a SQL script, parsed while streaming it
+    with open_source(source) as view:
+        tables = read_text(
+            view, encoding, lambda stream: parse_dump(iter_statements(stream))
+        )
+    # The parsed values are released table by table once converted
+    return {name: pd.DataFrame(tables.pop(name)) for name in list(tables)}
+
+
+def export_sql(
+    source, directory: str, delimiter: str = ",", encoding: str | None = None
+) -> dict[str, str]:
+    # CSV file (path) per table of a SQL script, written while streaming it
+    # Files of an attempt with a wrongly detected encoding are overwritten
+    with open_source(source) as view:
+        return read_text(
+            view,
+            encoding,
+            lambda stream: write_tables(iter_statements(stream), directory, delimiter),
+        )
@@ -2,9 +2,22 @@ import streamlit as st
 import pandas as pd
 from pandas import DataFrame
 import numpy as np
-from io import BytesIO, StringIO
 import pickle
-from sql import PostgreSQL, parse_statements, parse_tables, parse_inserts
+import hashlib
+import uuid
+from typing import BinaryIO, Iterator
+from sql import parse_statements, parse_dump
+from extract import read_delimited, read_excel, read_sql, sheet_names
+from convert import (
+    cache_key,
+    convert_df,
+    export_tables,
+    extension,
+    fingerprint,
+    open_cached,
+    tables_key,
+)
+from database import bulk_load, read_chunks
 
 FILE_TYPES = [
     "Delimited",
@@ -13,6 +26,14 @@ FILE_TYPES = [
     # "JSON",
     # "XML",
 ]
+SOURCE_TYPES = [*FILE_TYPES, "Database"]
+TARGET_TYPES = [*FILE_TYPES, "Database"]
+READERS = {
+    "Delimited": read_delimited,
+    "Excel": read_excel,
+    "Sheets": sheet_names,
+    "SQL": read_sql,
+}
 DELIMITERS = {
     "Comma": ",",
     "Semicolon": ";",
@@ -20,6 +41,15 @@ DELIMITERS = {
     "Space": " ",
     "Tab": "\t",
 }
+COMPRESSIONS = {
+    "None": None,
+    "Gzip": "gzip",
+    "Zstandard": "zstd",
+    "Bzip2": "bz2",
+    "Zip": "zip",
+}
+# Compressed files are decompressed (detected by magic bytes) while extracting
+COMPRESSED_TYPES = ["gz", "zst", "bz2", "zip"]
 
 # st.set_page_config(page_title="ETL App", page_icon=":material/database:")
 st.set_page_config(page_title="ETL App", page_icon="file_view.svg")
@@ -27,18 +57,46 @@ st.set_page_config(page_title="ETL App", page_icon="file_view.svg")
 st.title("ETL App")
 
 
+@st.cache_resource(max_entries=2, ttl=300, show_spinner="Reading database...")
+def read_source(
+    url: str, table: str, query: str, dtype: str | None
+) -> tuple[DataFrame, str]:
+    # First chunk of the database source (to preview), cached as a resource so
+    # reruns share it instead of unpickling a copy (do not modify it), together
+    # with an identifier of the read keying the conversions of the source (which
+    # read it again chunk by chunk) until the cache expires
+    chunks = read_chunks(url, table, query, dtype=dtype)
+    try:
+        return next(chunks), uuid.uuid4().hex
+    finally:
+        chunks.close()
+
+
+@st.cache_resource(max_entries=4, show_spinner="Reading file...")
+def read_upload(_file, file_id: str, reader: str, *args):
+    # Read an uploaded file (cached per upload to prevent reading on every rerun),
+    # as a resource so reruns share the result instead of unpickling a copy (do
+    # not modify it)
+    return READERS[reader](_file, *args)
+
+
 class ETL:
     def __init__(self):
         # Extract
         self.file = None
         self.interpretation = None
-        self.encoding = "utf-8-sig"
+        self.encoding = None  # Detected (BOM or sample) if not set
         self.file_type_in = None
         self.data_type = None
         self.delimiter_in = None
         self.sheet = None
         self.sql = ""
+        self.source_url = ""
+        self.source_table = ""
+        self.source_query = ""
         self.df: DataFrame = None
+        self.dataset_id: tuple = None
+        self.fingerprint: str = None
         # Transform
         # Load
         self.name = None
@@ -46,8 +104,10 @@ class ETL:
         self.file_type_out = None
         self.delimiter_out = None
         self.del_idx = None
+        self.compression_out = None
         self.db_name = ""
         self.db_table = ""
+        self.db_url = ""
 
     def import_settings(self):
         if st.button("Import ETL Settings"):
@@ -58,8 +118,7 @@ class ETL:
         st.subheader("Extract")
         with st.expander("View/Hide data extraction settings"):
             if self._upload_file():
-                self._read_data()
-                return True
+                return self._read_data()
         return False
 
     def transform(self) -> bool:
@@ -89,17 +148,24 @@ class ETL:
         )
         # Select data type of extraction
         data_type = st.radio(
-            "Select the file type of the data to extract:", FILE_TYPES, horizontal=True
+            "Select the file type of the data to extract:",
+            SOURCE_TYPES,
+            horizontal=True,
         )
+        if data_type == "Database":
+            self.data_type = data_type
+            return self._define_database()
         if data_type == "Delimited":
             # Define delimited file type
             self.file_type_in = self._define_delimited()
         elif data_type == "Excel":
             self.file_type_in = ["xlsx", "xls"]
         else:
-            self.file_type_in = data_type.lower()
+            self.file_type_in = [data_type.lower()]
         # File selection
-        self.file = st.file_uploader("Choose a file", self.file_type_in)
+        self.file = st.file_uploader(
+            "Choose a file", [*self.file_type_in, *COMPRESSED_TYPES]
+        )
         self.sql = ""
         if data_type == "SQL":
             if st.checkbox("Enter SQL statements manually"):
@@ -110,6 +176,8 @@ class ETL:
         elif data_type == "Excel":
             # Excel sheet selection
             self.sheet = self._sheet_selection()
+            if self.sheet is None:
+                return False
         self.data_type = data_type
         return True
 
@@ -128,26 +196,78 @@ class ETL:
         self.delimiter_in = delimiter
         return ["csv", "txt"]
 
-    def _sheet_selection(self) -> str:
+    def _define_database(self) -> bool:
+        # Connection string & table (or query) selection
+        self.source_url = st.text_input(
+            "Enter connection string:",
+            self.source_url,
+            placeholder="sqlite:///etl.db",
+            key="source_url",
+        )
+        self.source_table, self.source_query = "", ""
+        if st.checkbox("Enter SQL query manually"):
+            self.source_query = st.text_area("Enter SQL query:")
+        else:
+            self.source_table = st.text_input("Enter Table name:", key="source_table")
+        if self.source_url == "" or (
+            self.source_table == "" and self.source_query == ""
+        ):
+            st.write("Waiting on database selection...")
+            return False
+        return True
+
+    def _sheet_selection(self) -> str | None:
         # Excel sheet selection
-        xl = pd.ExcelFile(self.file)
-        return st.radio("Select a Excel sheet to extract:", xl.sheet_names)
-
-    def _read_data(self):
-        # Read file into DataFrame
-        if self.data_type == "Delimited":
-            self.df = pd.read_csv(
-                self.file,
-                sep=self.delimiter_in,
-                dtype=self.interpretation,
-                engine="python",
-                encoding=self.encoding,
-            )
-        elif self.data_type == "Excel":
-            self.df = pd.read_excel(self.file, self.sheet)
-        elif self.data_type == "SQL":
-            self.df = self._parse_sql()
-        # Preview data
+        try:
+            sheets = read_upload(self.file, self.file.file_id, "Sheets")
+        except Exception as e:
+            st.error(f"Reading data failed: {e}")
+            return None
+        return st.radio("Select a Excel sheet to extract:", sheets)
+
+    def _read_data(self) -> bool:
+        # Export all tables of a SQL script at once (instead of a single table)
+        if self.data_type == "SQL" and st.checkbox("Export all tables"):
+            self._export_tables()
+            return False
+        # Read file into DataFrame (reporting unreadable, e.g. corrupt compressed,
+        # files & unreachable databases instead of failing)
+        self.fingerprint = None
+        try:
+            if self.data_type == "Delimited":
+                self.dataset_id = (
+                    self.data_type,
+                    self.file.file_id,
+                    self.delimiter_in,
+                    self.interpretation,
+                    self.encoding,
+                )
+                self.df = read_upload(
+                    self.file,
+                    self.file.file_id,
+                    self.data_type,
+                    self.delimiter_in,
+                    self.interpretation,
+                    self.encoding,
+                )
+            elif self.data_type == "Excel":
+                self.dataset_id = (self.data_type, self.file.file_id, self.sheet)
+                self.df = read_upload(
+                    self.file, self.file.file_id, self.data_type, self.sheet
+                )
+            elif self.data_type == "SQL":
+                self.df = self._parse_sql()
+            elif self.data_type == "Database":
+                self.df, self.fingerprint = read_source(
+                    self.source_url,
+                    self.source_table,
+                    self.source_query,
+                    self.interpretation,
+                )
+        except Exception as e:
+            st.error(f"Reading data failed: {e}")
+            return False
+        # Preview data (the first chunk of a database source)
         if st.checkbox("Preview data"):
             preview_rows = st.slider(
                 "Preview row amount selection:",
@@ -156,21 +276,56 @@ class ETL:
                 step=1,
             )
             st.dataframe(self.df.head(preview_rows))
+        return True
+
+    def _export_tables(self):
+        delimiter = st.radio(
+            "Select a delimiter:",
+            DELIMITERS.values(),
+            horizontal=True,
+            captions=DELIMITERS.keys(),
+            key="tables_delimiter",
+        )
+        if self.file is not None:
+            source, source_id = self.file, self.file.file_id
+        else:
+            source = self.sql.encode("utf-8")
+            source_id = hashlib.sha1(source).hexdigest()
+        key = tables_key(source_id, delimiter, self.encoding)
+        f = open_cached(key)
+        if f is None:
+            # The script is parsed once, writing the rows of each table to its CSV
+            if not st.button(":material/sync: Convert Tables"):
+                return
+            with st.spinner("Converting tables..."):
+                try:
+                    f = export_tables(source, key)
+                except Exception as e:
+                    st.error(f"Converting tables failed: {e}")
+                    return
+        with f:
+            if st.download_button(
+                ":material/download: Download Tables", f, "tables.zip"
+            ):
+                st.write("Tables downloaded successfully as `tables.zip`.")
 
     def _parse_sql(self) -> DataFrame:
         if self.file is not None:
-            # Convert UploadedFile to a string based IO
-            stringio = StringIO(self.file.getvalue().decode("utf-8"))
-            # Read file as string
-            self.sql = stringio.read()
-        # Get statements of SQL script
-        statements = parse_statements(self.sql)
-        # Get tables from statements
-        tables = parse_tables(statements)
-        # Add insert values to tables
-        parse_inserts(statements, tables)
+            # Parse tables & inserts while decoding the uploaded SQL script, into
+            # a DataFrame per table (built once per upload)
+            tables = read_upload(
+                self.file, self.file.file_id, self.data_type, self.encoding
+            )
+            source_id = self.file.file_id
+        else:
+            # Parse tables & inserts of the statements entered manually
+            tables = parse_dump(parse_statements(self.sql))
+            source_id = hashlib.sha1(self.sql.encode("utf-8")).hexdigest()
         # Return selected table as DataFrame
         table = st.radio("Select the table to download:", tables.keys())
+        self.dataset_id = (self.data_type, source_id, self.encoding, table)
+        if self.file is not None:
+            return tables[table]
         return pd.DataFrame(tables[table])
 
     def _transform_data(self) -> bool | None:
@@ -185,8 +340,11 @@ class ETL:
     def _load_data(self):
         # Output extension selection
         self.file_type_out = st.radio(
-            "File type selection", FILE_TYPES, None, horizontal=True
+            "File type selection", TARGET_TYPES, None, horizontal=True
         )
+        if self.file_type_out == "Database":
+            self._load_database()
+            return
         # File name selection
         self.name = st.text_input("Enter a file name:", self.name)
         # Download data
@@ -213,55 +371,120 @@ class ETL:
             self.db_table = st.text_input("Enter Table name:")
             if self.db_name == "" or self.db_table == "":
                 return False
+        # Compression selection (Excel files are compressed already)
+        self.compression_out = None
+        if self.file_type_out != "Excel":
+            self.compression_out = st.radio(
+                "Select a compression:",
+                COMPRESSIONS.values(),
+                horizontal=True,
+                captions=COMPRESSIONS.keys(),
+            )
         # Download data
         if self.name:
-            data = self._convert_df()
-            if st.download_button(
-                ":material/download: Download Data",
-                data,
-                f"{self.name}{self.extension}",
-            ):
-                return True
+            self.extension = extension(
+                self.file_type_out, self.delimiter_out, self.compression_out
+            )
+            # Name of the file within a zip archive
+            member = f"{self.name}{extension(self.file_type_out, self.delimiter_out)}"
+            key = cache_key(
+                self._fingerprint(),
+                self.file_type_out,
+                self.delimiter_out,
+                self.db_name,
+                self.db_table,
+                self.compression_out,
+                member,
+            )
+            f = open_cached(key)
+            if f is None:
+                # Convert only on request, earlier conversions are reused
+                if not st.button(":material/sync: Convert Data"):
+                    return False
+                with st.spinner("Converting data..."):
+                    f = self._convert_df(key)
+            with f:
+                if st.download_button(
+                    ":material/download: Download Data",
+                    f,
+                    f"{self.name}{self.extension}",
+                ):
+                    return True
         return False
 
-    # @st.cache_data
-    # # IMPORTANT: Cache the conversion to prevent computation on every rerun
-    def _convert_df(self):
-        # Convert DataFrame to specific selections:
-        if self.file_type_out == "Delimited":
-            # - CSV
-            if (
-                self.delimiter_out == DELIMITERS["Comma"]
-                or self.delimiter_out == DELIMITERS["Semicolon"]
-            ):
-                self.extension = ".csv"
-                return self.df.to_csv(index=False, sep=self.delimiter_out)
-            # - TXT
-            elif (
-                self.delimiter_out == DELIMITERS["Pipe"]
-                or self.delimiter_out == DELIMITERS["Space"]
-            ):
-                self.extension = ".txt"
-                return self.df.to_csv(index=False, sep=self.delimiter_out)
-            elif self.delimiter_out == DELIMITERS["Tab"]:
-                self.extension = ".tsv"
-                return self.df.to_csv(index=False, sep=self.delimiter_out)
-        # - Excel
-        if self.file_type_out == "Excel":
-            self.extension = ".xlsx"
-            buffer = BytesIO()
-            with pd.ExcelWriter(buffer) as writer:
-                # Write each dataframe to a different worksheet.
-                self.df.to_excel(writer, sheet_name="Sheet1", index=False)
-                return buffer
-        # - SQL
-        if self.file_type_out == "SQL":
-            self.extension = ".sql"
-            sql = PostgreSQL(self.df, self.db_name, self.db_table)
-            sql.load_data()
-            return sql.write_script()
-        # - JSON
-        # - XML
+    def _load_database(self):
+        # Direct (bulk) load into a database table
+        self.db_url = st.text_input(
+            "Enter connection string:", self.db_url, placeholder="sqlite:///etl.db"
+        )
+        self.db_table = st.text_input("Enter Table name:", self.db_table)
+        if self.db_url == "" or self.db_table == "":
+            return
+        if not st.button(":material/upload: Load Data"):
+            return
+        bar = st.progress(0.0, "Inferring column types...")
+
+        def progress(rows: int, total: int | None, seconds: float):
+            rate = rows / seconds if seconds else 0
+            if total is None:
+                bar.progress(0.0, f"Loaded `{rows:,}` rows ({rate:,.0f} rows/s)")
+                return
+            bar.progress(
+                rows / total if total else 1.0,
+                f"Loaded `{rows:,}` of `{total:,}` rows ({rate:,.0f} rows/s)",
+            )
+
+        chunks, total = self._chunks(), self.df.shape[0]
+        if self.data_type == "Database":
+            # The number of rows is unknown until the source is read
+            total = None
+            if self.db_url == self.source_url:
+                if self.db_table == self.source_table:
+                    st.error("The source table cannot be loaded into itself.")
+                    return
+                if self.db_url.startswith("sqlite"):
+                    # SQLite locks the database while reading it, so the source is
+                    # read (into memory) before loading into the same database
+                    chunks = list(chunks)
+        try:
+            rows, seconds = bulk_load(
+                chunks, self.db_url, self.db_table, progress=progress, total=total
+            )
+        except Exception as e:
+            st.error(f"Loading data failed: {e}")
+            return
+        st.write(
+            f"Data loaded successfully into `{self.db_table}` "
+            f"(`{rows:,}` rows in `{seconds:.2f}` seconds)."
+        )
+
+    def _fingerprint(self) -> str:
+        # Fingerprint of the extracted data, computed once per dataset (instead of
+        # on every rerun) to key the converted outputs
+        if self.fingerprint is None:
+            dataset_id, value = st.session_state.get("fingerprint", (None, None))
+            if dataset_id != self.dataset_id:
+                value = fingerprint(self.df)
+                st.session_state["fingerprint"] = (self.dataset_id, value)
+            self.fingerprint = value
+        return self.fingerprint
+
+    def _convert_df(self, key: tuple) -> BinaryIO:
+        # Convert DataFrame to specific selections (CSV, TXT, TSV, Excel or SQL)
+        # into a temporary file, memoized by dataset fingerprint & load options
+        return convert_df(self._chunks(), key)
+
+    def _chunks(self) -> Iterator[DataFrame]:
+        # The extracted data in chunks, a database source is read (again) chunk by
+        # chunk instead of being kept in memory
+        if self.data_type == "Database":
+            return read_chunks(
+                self.source_url,
+                self.source_table,
+                self.source_query,
+                dtype=self.interpretation,
+            )
+        return iter([self.df])
 
 
 if __name__ == "__main__":
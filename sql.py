@@ -1,5 +1,13 @@
+import pandas as pd
 from pandas import DataFrame
+import csv
 import datetime
+import itertools
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, Iterator, TextIO
 
 CREATE = "CREATE TABLE"
 CREATE_IF = "CREATE TABLE IF NOT EXISTS"
@@ -7,6 +15,9 @@ INSERT = "INSERT INTO"
 CONSTRAINT = "CONSTRAINT"
 VALUES = "VALUES ("
 NULL = "NULL"
+CHUNK_SIZE = 1024**2
+# Rows formatted at a time while writing insert statements
+ROW_CHUNK_SIZE = 10_000
 
 # DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 DATETIME_FORMAT = "%Y-%m-%d %H:%M"
@@ -25,61 +36,195 @@ PRESERVED_KEYWORDS = [
 def parse_statements(sql: str):
     statements = []
     for statement in sql.split(";"):
-        statement = statement.replace("\n", "").strip()
-        while "  " in statement:
-            statement = statement.replace("  ", " ")
-        statements.append(statement)
+        statements.append(clean_statement(statement))
     return statements
 
 
+def iter_statements(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    # Statements of a SQL script read from a (text) stream in chunks
+    parts = []
+    while chunk := stream.read(chunk_size):
+        *statements, rest = chunk.split(";")
+        if statements:
+            statements[0] = "".join(parts) + statements[0]
+            parts = []
+            for statement in statements:
+                yield clean_statement(statement)
+        parts.append(rest)
+    yield clean_statement("".join(parts))
+
+
+def clean_statement(statement: str) -> str:
+    statement = statement.replace("\n", "").strip()
+    while "  " in statement:
+        statement = statement.replace("  ", " ")
+    return statement
+
+
 def parse_tables(statements: list[str]):
     tables = {}
     for statement in statements:
-        if statement.upper().startswith(CREATE_IF):
-            content = statement.replace(CREATE_IF, "").strip()
-        elif statement.upper().startswith(CREATE):
-            content = statement.replace(CREATE, "").strip()
-        else:
-            continue
-        table = {}
-        name, columns = content.split("(", 1)
-        for column in columns.split(","):
-            col = column.strip().split(" ")[0]
-            if col.upper() != CONSTRAINT:
-                table[col] = []
-        tables[name] = table
+        table = parse_table(statement)
+        if table is not None:
+            name, columns = table
+            tables[name] = {column: [] for column in columns}
     return tables
 
 
 def parse_inserts(statements: list[str], tables: dict):
     for statement in statements:
-        if statement.upper().startswith(INSERT):
-            content = statement.replace(INSERT, "").strip()
-        else:
+        row = parse_row(statement)
+        if row is not None:
+            add_row(tables, *row)
+
+
+def parse_dump(statements: Iterable[str]) -> dict:
+    # Parse tables & inserts in a single pass over the statements
+    # (tables are created before rows are inserted into them)
+    tables = {}
+    for statement in statements:
+        table = parse_table(statement)
+        if table is not None:
+            name, columns = table
+            tables[name] = {column: [] for column in columns}
             continue
-        name, col_val = content.split("(", 1)
-        columns = col_val.strip().split(")", 1)[0].strip().split(",")
-        columns = [column.strip() for column in columns]
-        values = col_val.strip().split(VALUES)[1]
-        values = values.strip().rsplit(")", 1)[0].strip().split(",")
-        val_dict = {}
-        for idx, column in enumerate(columns):
-            value = values[idx].strip()
-            if value.startswith("'") and value.endswith("'"):
-                value = value[1:-1]
-            val_dict[column.strip()] = value
-        if name in tables:
-            for column in tables[name]:
-                value = val_dict.get(column, None)
-                if value == NULL:
-                    value = None
-                tables[name][column].append(value)
+        row = parse_row(statement)
+        if row is not None:
+            add_row(tables, *row)
+    return tables
+
+
+def write_tables(
+    statements: Iterable[str], directory: str, delimiter: str = ","
+) -> dict[str, str]:
+    # Write the rows of each table to its own CSV file as they appear, in a
+    # single pass over the statements (only the file buffers are kept in memory)
+    paths = {}
+    columns = {}
+    files = {}
+    writers = {}
+    try:
+        for statement in statements:
+            table = parse_table(statement)
+            if table is not None:
+                name, columns[name] = table
+                if name in files:
+                    files[name].close()
+                else:
+                    paths[name] = _table_path(directory, name, paths.values())
+                files[name] = open(paths[name], "w", newline="", encoding="utf-8")
+                writers[name] = csv.writer(
+                    files[name], delimiter=delimiter, lineterminator=os.linesep
+                )
+                writers[name].writerow(columns[name])
+                continue
+            row = parse_row(statement)
+            if row is not None and row[0] in writers:
+                name, val_dict = row
+                values = [val_dict.get(column, None) for column in columns[name]]
+                writers[name].writerow([None if v == NULL else v for v in values])
+    finally:
+        for f in files.values():
+            f.close()
+    return paths
+
+
+def write_chunks(f: TextIO, chunks: Iterable[DataFrame], db_name: str, table_name: str):
+    # Script of the data in chunks. The create table statement precedes the rows,
+    # so the insert statements are spooled to a temporary file while the column
+    # types are inferred over all chunks
+    chunks = iter(chunks)
+    first = next(chunks)
+    second = next(chunks, None)
+    if second is None:
+        PostgreSQL(first, db_name, table_name).write_file(f)
+        return
+    sql = PostgreSQL(first, db_name, table_name)
+    sql.infer_types()
+    with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as spool:
+        written = sql._write_rows(spool)
+        for chunk in itertools.chain([second], chunks):
+            chunk_sql = PostgreSQL(chunk, db_name, table_name)
+            sql.merge_types(chunk_sql.infer_types())
+            written = chunk_sql._write_rows(spool, written)
+        sql._write_table(f)
+        spool.seek(0)
+        shutil.copyfileobj(spool, f)
+    if written:
+        f.write(";\n")
+
+
+def _table_path(directory: str, name: str, used: Iterable[str]) -> str:
+    # CSV file path for a table name, unique within the export (also on case
+    # insensitive file systems and in the zip archive, e.g. Users & users)
+    used = {os.path.normcase(path).lower() for path in used}
+    file_name = re.sub(r"[^\w.-]", "_", name.strip()) or "table"
+    path = os.path.join(directory, f"{file_name}.csv")
+    idx = 1
+    while os.path.normcase(path).lower() in used:
+        idx += 1
+        path = os.path.join(directory, f"{file_name}_{idx}.csv")
+    return path
+
+
+def parse_table(statement: str) -> tuple[str, list[str]] | None:
+    # Name & columns of a create table statement
+    if statement.upper().startswith(CREATE_IF):
+        content = statement.replace(CREATE_IF, "").strip()
+    elif statement.upper().startswith(CREATE):
+        content = statement.replace(CREATE, "").strip()
+    else:
+        return None
+    columns = []
+    name, column_defs = content.split("(", 1)
+    for column in column_defs.split(","):
+        col = column.strip().split(" ")[0]
+        if col.upper() != CONSTRAINT and col not in columns:
+            columns.append(col)
+    return name, columns
+
+
+def parse_row(statement: str) -> tuple[str, dict] | None:
+    # Table name & values (by column) of an insert statement
+    if statement.upper().startswith(INSERT):
+        content = statement.replace(INSERT, "").strip()
+    else:
+        return None
+    name, col_val = content.split("(", 1)
+    columns = col_val.strip().split(")", 1)[0].strip().split(",")
+    columns = [column.strip() for column in columns]
+    values = col_val.strip().split(VALUES)[1]
+    values = values.strip().rsplit(")", 1)[0].strip().split(",")
+    val_dict = {}
+    for idx, column in enumerate(columns):
+        value = values[idx].strip()
+        if value.startswith("'") and value.endswith("'"):
+            value = value[1:-1]
+        val_dict[column.strip()] = value
+    return name, val_dict
+
+
+def add_row(tables: dict, name: str, val_dict: dict):
+    if name in tables:
+        for column in tables[name]:
+            value = val_dict.get(column, None)
+            if value == NULL:
+                value = None
+            tables[name][column].append(value)
 
 
 class PostgreSQL:
     def __init__(self, df: DataFrame, db_name: str, table_name: str):
         # Source variables
-        self.df = df.fillna("")  # Replace all NaN values with an empty string
+        # Replace all NaN values with an empty string (nullable columns, e.g. Int64,
+        # cannot hold strings)
+        nullable = {
+            column: object
+            for column, d_type in df.dtypes.items()
+            if pd.api.types.is_extension_array_dtype(d_type)
+            and not pd.api.types.is_string_dtype(d_type)
+        }
+        self.df = df.astype(nullable).fillna("")
         self.db_name = db_name
         self.table_name = f"{db_name}.{table_name}"
         # Constants
@@ -128,6 +273,118 @@ class PostgreSQL:
     def write_script(self):
         return self.sql_script
 
+    def write_file(self, f: TextIO, chunk_size: int = ROW_CHUNK_SIZE):
+        # Write the script to a (text) file object, the insert statements row by
+        # row instead of building the whole script in memory
+        self.infer_types()
+        self._write_table(f)
+        if self._write_rows(f, 0, chunk_size):
+            f.write(";\n")
+
+    def merge_types(self, columns: dict[str, str]) -> dict[str, str]:
+        # Combine the column types inferred from another chunk of the data,
+        # returning the columns that require a higher type
+        changed = {}
+        for column, d_type in columns.items():
+            if d_type == "":
+                continue
+            previous = self.columns[column]["type"]
+            self._compare_data_type(column, d_type)
+            if self.columns[column]["type"] != previous:
+                changed[column] = self.columns[column]["type"]
+        return changed
+
+    def _write_table(self, f: TextIO):
+        # Schema, table & delete statements
+        f.write(self.schema_script)
+        f.write(self._set_table_script())
+        f.write(self.insert_script)
+
+    def _write_rows(
+        self, f: TextIO, written: int = 0, chunk_size: int = ROW_CHUNK_SIZE
+    ) -> int:
+        # Values of the insert statement, following the rows written before,
+        # returning the number of rows written in total
+        for start in range(0, self.df.shape[0], chunk_size):
+            for row in self._format_rows(self.df.iloc[start : start + chunk_size]):
+                if written == 0:
+                    f.write(f"INSERT INTO {self.table_name}\n{self.tab}(")
+                    f.write(", ".join(self.columns))
+                    f.write(")\nVALUES\n")
+                else:
+                    f.write(",\n")
+                f.write(f"{self.tab}({row})")
+                written += 1
+        return written
+
+    def _format_rows(self, df: DataFrame) -> Iterator[str]:
+        # Values of each row as formatted by _validate_data_type (NULL, numbers
+        # as is & other values quoted)
+        columns = []
+        for column in df.columns:
+            values = df[column].astype(str)
+            numeric, floats = self._numeric_values(values)
+            formatted = values.where(numeric | floats, "'" + values + "'")
+            null = (values == "") | (values == self.null)
+            columns.append(formatted.where(~null, self.null).tolist())
+        return map(", ".join, zip(*columns))
+
+    def infer_types(self) -> dict[str, str]:
+        # Set column types from the data without writing the script
+        self.columns = self._set_source_columns()
+        for column in self.columns:
+            self.columns[column]["type"] = self._infer_column_type(column)
+        return {column: info["type"] for column, info in self.columns.items()}
+
+    def _infer_column_type(self, column: str) -> str:
+        # Vectorised version of _validate_data_type over all values of a column,
+        # resulting in the highest data type found
+        if self.df.empty:
+            return ""
+        if pd.api.types.is_integer_dtype(self.df[column]):
+            return self.num
+        values = self.df[column].astype(str)
+        # NULL
+        values = values[(values != "") & (values != self.null)]
+        if values.empty:
+            return self.bit
+        numeric, floats = self._numeric_values(values)
+        values = values[~numeric & ~floats]
+        # Datetime
+        datetimes = pd.to_datetime(values, format=DATETIME_FORMAT, errors="coerce")
+        values = values[datetimes.isna()]
+        # Date
+        dates = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+        values = values[dates.isna()]
+        if not values.empty:
+            # Character
+            if self.columns[column]["length"] < 256:
+                return self.char
+            # Text
+            return self.text
+        if dates.notna().any():
+            return self.date
+        if datetimes.notna().any():
+            return self.datetime
+        if floats.any():
+            return self.float
+        return self.num
+
+    def _numeric_values(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        # Numeric & float values (as validated by _validate_data_type)
+        negative = values.str.startswith("-")
+        # Numeric
+        numeric = (values == "0") | (
+            ~values.str.startswith("0")
+            & (values.str.isdigit() | (negative & values.str[1:].str.isdigit()))
+        )
+        # Float
+        dotless = values.str.replace(".", "", n=1, regex=False)
+        floats = values.str.contains(".", regex=False) & (
+            dotless.str.isdigit() | (negative & dotless.str[1:].str.isdigit())
+        )
+        return numeric, floats
+
     def _set_source_columns(self):
         columns = {}
         # Rename columns where necessary
@@ -1,8 +1,14 @@
 import streamlit as st
+from streamlit import runtime
 import pandas as pd
 from io import StringIO
+import argparse
 import datetime
+import hashlib
+import os
 from pprint import pp
+from convert import export_tables, open_cached, tables_key
+from extract import export_sql
 
 CREATE = "CREATE TABLE"
 CREATE_IF = "CREATE TABLE IF NOT EXISTS"
@@ -15,7 +21,11 @@ NULL = "NULL"
 def main():
     sql_string = st.text_area("Enter SQL statements:")
     if sql_string:
-        parse_sql(sql_string)
+        if st.checkbox("Export all tables"):
+            source = sql_string.encode("utf-8")
+            export_all_tables(source, hashlib.sha1(source).hexdigest())
+        else:
+            parse_sql(sql_string)
 
 
 def file_upload():
@@ -50,6 +60,29 @@ def parse_sql(sql: str):
     create_csv_tables(tables)
 
 
+def export_all_tables(source, source_id: str):
+    # Stream through the script once, writing each table to its own CSV (zipped)
+    delimiter = st.radio("Select the delimiter of the CSVs:", [";", ","])
+    key = tables_key(source_id, delimiter)
+    f = open_cached(key)
+    if f is None:
+        if not st.button(":material/sync: Convert Tables"):
+            return
+        with st.spinner("Converting tables..."):
+            f = export_tables(source, key)
+    with f:
+        if st.download_button(":material/download: Download Data", f, "tables.zip"):
+            return
+
+
+def export_directory(source: str, directory: str, delimiter: str):
+    # Headless: stream through the script once, writing each table to a CSV
+    os.makedirs(directory, exist_ok=True)
+    paths = export_sql(source, directory, delimiter)
+    for table, path in paths.items():
+        print(f"{table.strip()}: {path}")
+
+
 def create_csv_tables(tables: dict):
     table = st.radio("Select the table to download:", tables.keys())
     delimiter = st.radio("Select the delimiter of the CSV:", [";", ","])
@@ -123,4 +156,15 @@ def parse_inserts(statements: list[str], tables: dict):
 
 
 if __name__ == "__main__":
-    main()
+    if runtime.exists():
+        main()
+    else:
+        # Headless mode, e.g. `python sql_to_csv.py dump.sql.gz tables`
+        parser = argparse.ArgumentParser(
+            description="Export all tables of a SQL script to CSV files."
+        )
+        parser.add_argument("source", help="SQL script (optionally compressed)")
+        parser.add_argument("directory", help="Output directory of the CSV files")
+        parser.add_argument("-d", "--delimiter", default=";")
+        args = parser.parse_args()
+        export_directory(args.source, args.directory, args.delimiter)
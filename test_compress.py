@@ -0,0 +1,42 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from compress import detect_codec
+from extract import read_delimited
+
+CSV = b"id,name\n1,Ann\n2,Bob\n"
+
+
+def test_detect_codec():
+    assert detect_codec(gzip.compress(CSV)[:4]) == "gzip"
+    assert detect_codec(b"BZh9") == "bz2"
+    # Text starting with BZh is not a bz2 stream
+    assert detect_codec(b"BZh,") is None
+    assert detect_codec(CSV[:4]) is None
+
+
+def test_read_compressed():
+    df = read_delimited(io.BytesIO(gzip.compress(CSV)), ",", None)
+    assert df["name"].tolist() == ["Ann", "Bob"]
+
+
+def test_read_corrupt_stream():
+    data = gzip.compress(CSV)
+    # Checksum mismatch
+    with pytest.raises(gzip.BadGzipFile):
+        read_delimited(io.BytesIO(data[:-8] + b"\0" * 4 + data[-4:]), ",", None)
+    # Truncated stream
+    with pytest.raises(EOFError):
+        read_delimited(io.BytesIO(data[:-12]), ",", None)
+
+
+def test_read_zip_with_multiple_files():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("a.csv", CSV)
+        archive.writestr("b.csv", CSV)
+    with pytest.raises(ValueError, match="a.csv, b.csv"):
+        read_delimited(io.BytesIO(buffer.getvalue()), ",", None)
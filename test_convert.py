@@ -0,0 +1,55 @@
+import io
+
+import pandas as pd
+import pytest
+
+import convert
+from convert import cache_key, clear_cache, convert_df, fingerprint, open_cached
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(convert, "CACHE_SIZE", 1)
+    yield
+    clear_cache()
+
+
+def key(df: pd.DataFrame) -> tuple:
+    return cache_key(fingerprint(df), "Delimited", ",", "", "")
+
+
+def test_convert_reuses_conversion():
+    df = pd.DataFrame({"id": [1, 2]})
+    assert open_cached(key(df)) is None
+    with convert_df([df], key(df)) as f:
+        assert f.read() == b"id\n1\n2\n"
+    with open_cached(key(df)) as f:
+        assert f.read() == b"id\n1\n2\n"
+
+
+def test_evicted_conversion_remains_readable():
+    df, other = pd.DataFrame({"id": [1]}), pd.DataFrame({"id": [2]})
+    with convert_df([df], key(df)) as f:
+        # Another session evicts (removes) the conversion before it is read
+        convert_df([other], key(other)).close()
+        assert open_cached(key(df)) is None
+        assert f.read() == b"id\n1\n"
+
+
+@pytest.mark.parametrize("file_type_out", ["Delimited", "Excel", "SQL"])
+def test_convert_chunks(file_type_out):
+    df = pd.DataFrame({"id": [1, 2, 3], "name": ["Ann", "Bob", None]})
+    chunk_key = cache_key("chunks", file_type_out, ",", "db", "people")
+    with convert_df(iter([df.iloc[:2], df.iloc[2:]]), chunk_key) as f:
+        chunked = f.read()
+    clear_cache()
+    with convert_df([df], chunk_key) as f:
+        single = f.read()
+    if file_type_out == "Excel":
+        # Workbooks hold their creation time
+        chunked, single = pd.read_excel(io.BytesIO(chunked)), pd.read_excel(
+            io.BytesIO(single)
+        )
+        pd.testing.assert_frame_equal(chunked, single)
+    else:
+        assert chunked == single
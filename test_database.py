@@ -0,0 +1,153 @@
+import sqlite3
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import database
+from database import bulk_load, get_adapter, read_chunks, read_database
+
+
+@pytest.fixture
+def url(tmp_path) -> str:
+    return f"sqlite:///{tmp_path / 'etl.db'}"
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "ID": [1, 2, 3, 4, 5],
+            "first name": ["Ann", "Bob", None, "Dan", "Eve"],
+            "score": [1.5, np.nan, 3.25, 4.0, 5.5],
+            "created": pd.to_datetime(
+                ["2024-09-27 12:42", None, "2024-09-28 08:00", None, None]
+            ),
+            "note": ["a", "NULL", "c", "", "e"],
+        }
+    )
+
+
+def test_bulk_load_round_trip(url, df):
+    progress = []
+    rows, seconds = bulk_load(
+        [df],
+        url,
+        "people",
+        batch_size=2,
+        progress=lambda *args: progress.append(args),
+        total=5,
+    )
+    assert rows == 5
+    assert seconds >= 0
+    # Reported once the table is created and after each batch
+    assert [(loaded, total) for loaded, total, _ in progress] == [
+        (0, 5),
+        (2, 5),
+        (4, 5),
+        (5, 5),
+    ]
+    assert all(elapsed <= seconds for *_, elapsed in progress)
+
+    result = read_database(url, "people")
+    # Reserved keywords are suffixed & spaces replaced
+    assert list(result.columns) == [
+        "ID_column",
+        "first_name",
+        "score",
+        "created",
+        "note",
+    ]
+    assert result["ID_column"].tolist() == [1, 2, 3, 4, 5]
+    assert result["first_name"].tolist()[:2] == ["Ann", "Bob"]
+    # NaN, None, NaT, empty & NULL strings are loaded as NULL
+    assert result["first_name"].isna().tolist() == [False, False, True, False, False]
+    assert result["score"].isna().tolist() == [False, True, False, False, False]
+    assert result["created"].tolist()[0] == "2024-09-27 12:42:00"
+    assert result["created"].isna().tolist() == [False, True, False, True, True]
+    assert result["note"].isna().tolist() == [False, True, False, True, False]
+
+
+def test_bulk_load_column_types(url, df):
+    bulk_load([df], url, "people")
+    path = url.split("://", 1)[1][1:]
+    with sqlite3.connect(path) as conn:
+        types = {
+            name: d_type
+            for _, name, d_type, *_ in conn.execute("PRAGMA table_info(people)")
+        }
+    assert types["ID_column"] == "INTEGER"
+    assert types["score"] == "REAL"
+    assert types["first_name"] == "TEXT"
+
+
+def test_read_chunks(url, df):
+    bulk_load([df], url, "people")
+    chunks = list(read_chunks(url, "people", chunk_size=2))
+    assert [chunk.shape[0] for chunk in chunks] == [2, 2, 1]
+    result = read_database(url, query='SELECT "ID_column" FROM people WHERE 0')
+    assert result.shape == (0, 1)
+
+
+def test_read_string_interpretation(url, df):
+    bulk_load([df], url, "people")
+    result = read_database(url, "people", dtype="str")
+    assert result["ID_column"].tolist() == ["1", "2", "3", "4", "5"]
+    assert result["score"].isna().tolist() == [False, True, False, False, False]
+
+
+def test_read_query_without_rows(url, df):
+    bulk_load([df], url, "people")
+    with pytest.raises(ValueError, match="Query returns no rows"):
+        read_database(url, query="DELETE FROM people")
+    # The statement is rolled back
+    assert read_database(url, "people").shape[0] == 5
+
+
+def test_postgresql_driver_is_stripped(monkeypatch):
+    urls = []
+    monkeypatch.setattr(
+        database, "psycopg2", SimpleNamespace(connect=lambda url: urls.append(url))
+    )
+    get_adapter("postgresql+psycopg2://user@localhost/etl").connect()
+    assert urls == ["postgresql://user@localhost/etl"]
+
+
+def test_read_chunk_types(url):
+    path = url.split("://", 1)[1][1:]
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE people (id INTEGER, name TEXT, score REAL, n)")
+        conn.executemany(
+            "INSERT INTO people VALUES (?, ?, ?, ?)",
+            [(None, None, None, None), (None, None, None, 1), (1, "Ann", 1, 2.5)],
+        )
+    # Declared (table) types, also of the chunks without values
+    chunks = list(read_chunks(url, "people", chunk_size=2))
+    assert [str(chunk["id"].dtype) for chunk in chunks] == ["Int64", "Int64"]
+    assert chunks[1]["id"].tolist() == [1]
+    assert len({chunk["name"].dtype for chunk in chunks}) == 1
+    assert [str(chunk["score"].dtype) for chunk in chunks] == ["float64", "float64"]
+    # Types of the first values (query results are not described)
+    chunks = list(read_chunks(url, query="SELECT n, id FROM people", chunk_size=2))
+    assert [str(chunk["n"].dtype) for chunk in chunks] == ["Int64", "object"]
+
+
+def test_bulk_load_chunks(url, df):
+    # Columns are widened to the types later chunks require (score is all NULL
+    # & code numeric in the first chunk)
+    df["code"] = ["1", "2", "007", "4", "5"]
+    rows, _ = bulk_load(iter([df.iloc[1:2], df.iloc[2:]]), url, "people")
+    assert rows == 4
+    path = url.split("://", 1)[1][1:]
+    with sqlite3.connect(path) as conn:
+        types = {
+            name: d_type
+            for _, name, d_type, *_ in conn.execute("PRAGMA table_info(people)")
+        }
+    assert types["score"] == "REAL"
+    assert types["code"] == "TEXT"
+    result = read_database(url, "people")
+    assert result["ID_column"].tolist() == [2, 3, 4, 5]
+    assert result["score"].tolist()[1:] == [3.25, 4.0, 5.5]
+    assert result["code"].tolist() == ["2", "007", "4", "5"]
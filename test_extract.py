@@ -0,0 +1,18 @@
+import codecs
+import io
+
+from extract import SAMPLE_SIZE, detect_encodings, read_delimited
+
+
+def test_detect_encodings():
+    assert detect_encodings(codecs.BOM_UTF8 + b"id") == ["utf-8-sig"]
+    assert detect_encodings(b"id") == ["utf-8", "cp1252", "latin-1"]
+    assert detect_encodings("café au lait".encode("cp1252")) == ["cp1252", "latin-1"]
+
+
+def test_read_undetected_encoding():
+    # A cp1252 character beyond the sample used to detect the encoding
+    rows = "".join(f"{idx},a\n" for idx in range(SAMPLE_SIZE // 4))
+    data = f"id,name\n{rows}0,café€\n".encode("cp1252")
+    df = read_delimited(io.BytesIO(data), ",", None)
+    assert df["name"].iloc[-1] == "café€"
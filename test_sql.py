@@ -0,0 +1,64 @@
+import io
+import os
+
+import pandas as pd
+
+from extract import read_sql
+from sql import PostgreSQL, _table_path, iter_statements, write_chunks, write_tables
+
+SCRIPT = """
+CREATE TABLE Users (id INT, name VARCHAR(10));
+INSERT INTO Users (id, name) VALUES (1, 'Ann');
+CREATE TABLE users (id INT);
+INSERT INTO users (id) VALUES (2);
+"""
+
+
+def test_table_path_ignores_case(tmp_path):
+    used = [os.path.join(tmp_path, "Users.csv")]
+    path = _table_path(str(tmp_path), "users", used)
+    assert os.path.basename(path) == "users_2.csv"
+
+
+def test_write_tables_per_table(tmp_path):
+    paths = write_tables(iter_statements(io.StringIO(SCRIPT)), str(tmp_path))
+    assert sorted(os.path.basename(path) for path in paths.values()) == [
+        "Users.csv",
+        "users_2.csv",
+    ]
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_read_sql_tables(tmp_path):
+    path = tmp_path / "dump.sql"
+    path.write_text(SCRIPT)
+    tables = read_sql(str(path))
+    assert [name.strip() for name in tables] == ["Users", "users"]
+    users = next(iter(tables.values()))
+    assert users.to_dict("list") == {"id": ["1"], "name": ["Ann"]}
+
+
+def test_write_file():
+    df = pd.DataFrame({"ID": [1, 2], "name": ["Ann", None], "score": [1.5, None]})
+    f = io.StringIO()
+    PostgreSQL(df, "db", "people").write_file(f, chunk_size=1)
+    script = f.getvalue()
+    assert (
+        "    ID_column NUMERIC,\n    name VARCHAR(255),\n    score FLOAT,\n" in script
+    )
+    assert script.endswith(
+        "INSERT INTO db.people\n    (ID_column, name, score)\nVALUES\n"
+        "    (1, 'Ann', 1.5),\n    (2, NULL, NULL);\n"
+    )
+    assert script.count("INSERT INTO") == 1
+
+
+def test_write_chunks():
+    # The types are inferred over all chunks (score is all NULL in the first)
+    df = pd.DataFrame({"ID": [1, 2, 3], "score": [None, 1.5, None]})
+    f = io.StringIO()
+    write_chunks(f, iter([df.iloc[:1], df.iloc[1:2], df.iloc[2:]]), "db", "people")
+    single = io.StringIO()
+    PostgreSQL(df, "db", "people").write_file(single)
+    assert f.getvalue() == single.getvalue()
+    assert "    score FLOAT,\n" in f.getvalue()